@@ -5,24 +5,29 @@ and sends detection results back via WebSocket.
 """
 
 import asyncio
-import json
 import logging
+import time
 import uuid
-from typing import Set
-from contextlib import asynccontextmanager
-
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from collections import deque
+from typing import Deque, Dict, Set
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import (
+    FastAPI,
+    File,
+    HTTPException,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import redis
-from rq import Queue
+import redis.asyncio as aioredis
+import msgpack
 from dotenv import load_dotenv
 import os
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
 # Load environment variables
 load_dotenv()
 
@@ -30,42 +35,119 @@ load_dotenv()
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 128))
 BACKEND_PORT = int(os.getenv("BACKEND_PORT", 8000))
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO" if DEBUG else "WARNING").upper()
+FRAME_STREAM = os.getenv("FRAME_STREAM", "frames")
+FRAME_STREAM_MAXLEN = 1000  # Approximate cap so an idle worker pool can't fill Redis
+SEND_QUEUE_SIZE = 256  # Results buffered per client before new ones are dropped
+RESULT_CHANNEL_PREFIX = "detections:"  # Workers publish to detections:<client_id>
+MAX_INFLIGHT_PER_CLIENT = int(os.getenv("MAX_INFLIGHT_PER_CLIENT", 2))
+INFLIGHT_TIMEOUT = 5.0  # Seconds before an unanswered frame stops counting
+
+# Configure logging
+logging.basicConfig(level=LOG_LEVEL)
+logger = logging.getLogger(__name__)
 
 # Global state
+redis_pool = None
 redis_client = None
-job_queue = None
+result_pubsub = None  # One pattern subscription shared by all clients
+result_router_task = None
 active_connections: Set[WebSocket] = set()
-client_result_channels: dict = {}  # Map client_id -> Redis pubsub channel
+client_send_queues: Dict[str, asyncio.Queue] = {}  # Map client_id -> send queue
+client_inflight: Dict[str, Deque[float]] = {}  # Map client_id -> enqueue times
+
+
+async def route_results():
+    """
+    Demultiplex every client's results from the shared pattern subscription.
+
+    Each pmessage on detections:<client_id> goes into that client's send
+    queue; results for clients that are gone are dropped.
+    """
+    prefix_len = len(RESULT_CHANNEL_PREFIX)
+
+    while True:
+        try:
+            # listen() awaits on the socket, so there is no polling delay
+            async for message in result_pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+
+                client_id = message["channel"][prefix_len:].decode()
+                out_queue = client_send_queues.get(client_id)
+                if out_queue is None:
+                    continue
+
+                # Every frame gets exactly one result (success or error).
+                # Results are relayed undecoded, so this pops the oldest
+                # entry rather than the frame's own: a result arriving after
+                # its frame expired (INFLIGHT_TIMEOUT) releases a newer
+                # frame's slot early, letting at most one extra frame through
+                inflight = client_inflight.get(client_id)
+                if inflight:
+                    inflight.popleft()
+
+                try:
+                    out_queue.put_nowait(message["data"])
+                except asyncio.QueueFull:
+                    # Client is not keeping up; drop rather than buffer
+                    logger.warning(f"Send queue full, dropping result for {client_id}")
+        except Exception as e:
+            # Keep routing for everyone else; pubsub resubscribes on reconnect
+            logger.error(f"Error listening for results: {e}")
+            await asyncio.sleep(1)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage app startup and shutdown."""
-    global redis_client, job_queue
+    global redis_pool, redis_client, result_pubsub, result_router_task
 
     # Startup
     logger.info("Starting FastAPI server...")
     try:
-        redis_client = redis.Redis(
-            host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=False
+        # Shared, bounded pool: concurrent handlers get their own connections
+        # instead of queueing behind one, and wait (up to 1s) when it's full
+        redis_pool = aioredis.BlockingConnectionPool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            decode_responses=False,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=1,
         )
-        redis_client.ping()
+        redis_client = aioredis.Redis(connection_pool=redis_pool)
+        await redis_client.ping()
         logger.info(f"✓ Connected to Redis at {REDIS_HOST}:{REDIS_PORT}")
     except redis.ConnectionError as e:
         logger.error(f"✗ Failed to connect to Redis: {e}")
         raise
 
-    job_queue = Queue(connection=redis_client)
-    logger.info(f"✓ Job queue initialized")
+    # A single connection receives results for every client
+    result_pubsub = redis_client.pubsub()
+    await result_pubsub.psubscribe(f"{RESULT_CHANNEL_PREFIX}*")
+    result_router_task = asyncio.create_task(route_results())
+    logger.info(f"✓ Subscribed to {RESULT_CHANNEL_PREFIX}*")
 
     yield
 
     # Shutdown
     logger.info("Shutting down FastAPI server...")
+    if result_router_task:
+        result_router_task.cancel()
+        # Let the cancelled read finish with the connection before closing it
+        with suppress(asyncio.CancelledError):
+            await result_router_task
+    if result_pubsub:
+        await result_pubsub.punsubscribe()
+        await result_pubsub.aclose()
     if redis_client:
-        redis_client.close()
+        await redis_client.aclose()
+    if redis_pool:
+        await redis_pool.disconnect()
     logger.info("✓ Redis connection closed")
 
 
@@ -90,11 +172,11 @@ app.add_middleware(
 async def health_check():
     """Health check endpoint."""
     try:
-        redis_client.ping()
+        await redis_client.ping()
         return {
             "status": "healthy",
             "redis": "connected",
-            "queue_size": len(job_queue.jobs),
+            "queue_size": await redis_client.xlen(FRAME_STREAM),
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -105,8 +187,8 @@ async def health_check():
 async def get_status():
     """Get current system status."""
     try:
-        queue_size = len(job_queue.jobs)
-        active_workers = redis_client.keys("rq:worker:*")
+        queue_size = await redis_client.xlen(FRAME_STREAM)
+        active_workers = await redis_client.keys("detector:worker:*")
 
         return {
             "queue_size": queue_size,
@@ -119,6 +201,26 @@ async def get_status():
         raise HTTPException(status_code=500, detail="Status check failed")
 
 
+async def enqueue_frame(
+    frame_id: str, frame_bytes: bytes, client_id: str, result_channel: str
+) -> None:
+    """
+    Append a frame job to the frame stream.
+
+    The JPEG bytes travel as a plain stream field, no job serialization;
+    workers read entries in micro-batches through a consumer group.
+    """
+    job = {
+        "frame_id": frame_id,
+        "client_id": client_id,
+        "result_channel": result_channel,
+        "data": frame_bytes,
+    }
+    await redis_client.xadd(
+        FRAME_STREAM, job, maxlen=FRAME_STREAM_MAXLEN, approximate=True
+    )
+
+
 @app.websocket("/ws/stream")
 async def websocket_endpoint(websocket: WebSocket):
     """
@@ -128,7 +230,8 @@ async def websocket_endpoint(websocket: WebSocket):
     - Binary frame data (JPEG compressed image)
 
     Server sends:
-    - JSON detection results: {frame_id, detections: [{x, y, w, h, label, confidence}]}
+    - Binary msgpack array of detection results, batched per send:
+      [{frame_id, detections: [{x, y, w, h, label, confidence}]}, ...]
     """
     client_id = str(uuid.uuid4())[:8]
     await websocket.accept()
@@ -137,32 +240,43 @@ async def websocket_endpoint(websocket: WebSocket):
         f"Client {client_id} connected. Active connections: {len(active_connections)}"
     )
 
-    # Create a dedicated result channel for this client
-    pubsub = redis_client.pubsub()
-    result_channel = f"detections:{client_id}"
-    pubsub.subscribe(result_channel)
-    client_result_channels[client_id] = (pubsub, result_channel)
+    # Results for this client, filled by route_results and drained by a
+    # single sender task
+    result_channel = f"{RESULT_CHANNEL_PREFIX}{client_id}"
+    out_queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+    client_send_queues[client_id] = out_queue
+    inflight: Deque[float] = deque()
+    client_inflight[client_id] = inflight
+    array_header = msgpack.Packer()
 
     try:
         frame_count = 0
 
-        # Start async task to listen for detection results
-        async def listen_for_results():
-            """Listen for detection results on Redis pubsub in a background task."""
-            while True:
-                try:
-                    message = pubsub.get_message()
-                    if message and message["type"] == "message":
-                        detection_data = json.loads(message["data"])
-                        await websocket.send_json(detection_data)
-                        logger.debug(f"Sent detection result to {client_id}")
-                    await asyncio.sleep(0.01)  # Prevent busy-waiting
-                except Exception as e:
-                    logger.error(f"Error listening for results: {e}")
-                    break
-
-        # Start the background listener task
-        listener_task = asyncio.create_task(listen_for_results())
+        async def send_results():
+            """Send queued results to the client, batching whatever is waiting."""
+            try:
+                while True:
+                    batch = [await out_queue.get()]
+
+                    # Drain everything already queued so a burst of results
+                    # goes out as a single WebSocket frame
+                    while not out_queue.empty():
+                        batch.append(out_queue.get_nowait())
+
+                    # Results are already msgpack-encoded by the worker, so
+                    # splice them behind an array header instead of decoding;
+                    # binary frames also skip UTF-8 validation on the socket
+                    await websocket.send_bytes(
+                        array_header.pack_array_header(len(batch)) + b"".join(batch)
+                    )
+                    logger.debug(
+                        f"Sent {len(batch)} detection result(s) to {client_id}"
+                    )
+            except Exception as e:
+                logger.error(f"Error sending results to {client_id}: {e}")
+
+        # Start the background sender task
+        sender_task = asyncio.create_task(send_results())
 
         # Main loop: receive frames from client
         while True:
@@ -175,7 +289,11 @@ async def websocket_endpoint(websocket: WebSocket):
 
                 frame_id = f"{client_id}:{frame_count}"
                 frame_count += 1
-                logger.info(f"Received frame {frame_id}, size: {len(data)} bytes")
+                # Per-frame logs are debug only, and guarded so the message
+                # isn't even formatted in production
+                log_frames = logger.isEnabledFor(logging.DEBUG)
+                if log_frames:
+                    logger.debug(f"Received frame {frame_id}, size: {len(data)} bytes")
 
                 # Validate frame size (must be < 5MB)
                 if len(data) > 5 * 1024 * 1024:
@@ -184,21 +302,44 @@ async def websocket_endpoint(websocket: WebSocket):
                     )
                     continue
 
-                # Store frame in Redis with TTL of 60 seconds
-                frame_key = f"frame:{frame_id}"
-                redis_client.setex(frame_key, 60, data)
+                # Backpressure: with too many frames still in flight, drop
+                # this one instead of queueing it. Latency stays at about one
+                # inference time and the stream can't grow without bound.
+                # Frames whose result never came back stop counting after
+                # INFLIGHT_TIMEOUT.
+                now = time.monotonic()
+                while inflight and now - inflight[0] > INFLIGHT_TIMEOUT:
+                    inflight.popleft()
+
+                if len(inflight) >= MAX_INFLIGHT_PER_CLIENT:
+                    dropped = {
+                        "frame_id": frame_id,
+                        "client_id": client_id,
+                        "status": "dropped",
+                    }
+                    try:
+                        out_queue.put_nowait(msgpack.packb(dropped))
+                    except asyncio.QueueFull:
+                        pass  # Already behind on sends; the notice can go too
+                    continue
 
-                # Enqueue job to worker
-                job = job_queue.enqueue(
-                    "workers.detector.detect_objects",
-                    frame_id=frame_id,
-                    frame_key=frame_key,
-                    client_id=client_id,
-                    result_channel=result_channel,
-                    job_timeout=10,
-                )
+                # Count the frame before awaiting, so a result that arrives
+                # during the XADD doesn't find it missing
+                inflight.append(now)
 
-                logger.info(f"Enqueued job {job.id} for frame {frame_id}")
+                # Enqueue job to worker with the JPEG bytes inlined, so the
+                # worker gets the frame with the job instead of a separate GET
+                try:
+                    await enqueue_frame(frame_id, data, client_id, result_channel)
+                except Exception:
+                    try:
+                        inflight.remove(now)
+                    except ValueError:
+                        pass  # Already released by route_results
+                    raise
+
+                if log_frames:
+                    logger.debug(f"Enqueued frame {frame_id}")
 
             except WebSocketDisconnect:
                 break
@@ -210,15 +351,11 @@ async def websocket_endpoint(websocket: WebSocket):
         # Cleanup
         active_connections.discard(websocket)
 
-        # Cancel listener task
-        if "listener_task" in locals():
-            listener_task.cancel()
-
-        # Cleanup Redis pubsub
-        if client_id in client_result_channels:
-            pubsub, _ = client_result_channels.pop(client_id)
-            pubsub.unsubscribe()
-            pubsub.close()
+        # Stop routing results to this client and cancel its sender task
+        client_send_queues.pop(client_id, None)
+        client_inflight.pop(client_id, None)
+        if "sender_task" in locals():
+            sender_task.cancel()
 
         logger.info(
             f"Client {client_id} disconnected. Active connections: {len(active_connections)}"
@@ -226,30 +363,27 @@ async def websocket_endpoint(websocket: WebSocket):
 
 
 @app.post("/detect")
-async def detect_image(frame_id: str):
+async def detect_image(frame_id: str, frame: UploadFile = File(...)):
     """
-    REST endpoint to trigger detection on a stored frame.
-    Used for testing without WebSocket.
+    REST endpoint to trigger detection on an uploaded JPEG frame.
+    Used for testing without WebSocket; the result is published on
+    detections:test.
     """
-    frame_key = f"frame:{frame_id}"
+    frame_bytes = await frame.read()
+    if not frame_bytes:
+        raise HTTPException(status_code=400, detail="Empty frame")
 
-    if not redis_client.exists(frame_key):
-        raise HTTPException(status_code=404, detail="Frame not found")
+    # Same limit as WebSocket frames
+    if len(frame_bytes) > 5 * 1024 * 1024:
+        raise HTTPException(status_code=413, detail="Frame exceeds 5MB limit")
 
     client_id = "test"
-    result_channel = f"detections:{client_id}"
+    result_channel = f"{RESULT_CHANNEL_PREFIX}{client_id}"
 
     # Enqueue detection job
-    job = job_queue.enqueue(
-        "workers.detector.detect_objects",
-        frame_id=frame_id,
-        frame_key=frame_key,
-        client_id=client_id,
-        result_channel=result_channel,
-        job_timeout=10,
-    )
+    await enqueue_frame(frame_id, frame_bytes, client_id, result_channel)
 
-    return {"job_id": job.id, "frame_id": frame_id, "status": "queued"}
+    return {"frame_id": frame_id, "status": "queued"}
 
 
 if __name__ == "__main__":
@@ -277,6 +411,11 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=BACKEND_PORT,
         reload=DEBUG,
-        log_level="info",
+        loop="uvloop",
+        http="httptools",
+        # Deflating small msgpack frames costs more CPU than it saves
+        ws_per_message_deflate=False,
+        log_level=LOG_LEVEL.lower(),
+        access_log=DEBUG,
         # **ssl_kwargs,
     )
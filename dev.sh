@@ -41,7 +41,7 @@ if ! command -v docker &> /dev/null; then
     # Start workers
     echo -e "${BLUE}Starting detection workers...${NC}"
     for i in {1..2}; do
-        rq worker -u redis://localhost:6379/0 --with-scheduler &
+        python -m workers.detector &
     done
     
     echo ""
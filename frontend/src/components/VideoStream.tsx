@@ -1,5 +1,6 @@
 import React, { useRef, useEffect, useState, useCallback } from 'react';
 import Webcam from 'react-webcam';
+import { decode } from '@msgpack/msgpack';
 import './VideoStream.css';
 
 interface VideoStreamProps {
@@ -121,6 +122,8 @@ const VideoStream: React.FC<VideoStreamProps> = ({
 
     try {
       const ws = new WebSocket(wsUrl);
+      // Results arrive as binary msgpack frames
+      ws.binaryType = 'arraybuffer';
       
       ws.onopen = () => {
         console.log('WebSocket connected');
@@ -129,12 +132,14 @@ const VideoStream: React.FC<VideoStreamProps> = ({
 
       ws.onmessage = (event) => {
         try {
-          const detectionData = JSON.parse(event.data);
-          
-          if (detectionData.status === 'success') {
-            lastDetectionsRef.current = detectionData.detections || [];
-            onDetectionsUpdate(detectionData.detections);
-            
+          // Server batches results: each message is an array, oldest first
+          const batch = decode(new Uint8Array(event.data)) as any[];
+          let latest: any = null;
+
+          for (const detectionData of batch) {
+            if (detectionData.status !== 'success') continue;
+            latest = detectionData;
+
             // Track latency
             statsRef.current.framesProcessed++;
             if (detectionData.inference_time_ms) {
@@ -144,6 +149,12 @@ const VideoStream: React.FC<VideoStreamProps> = ({
               }
             }
           }
+
+          // Only the newest frame in the batch is worth drawing
+          if (latest) {
+            lastDetectionsRef.current = latest.detections || [];
+            onDetectionsUpdate(latest.detections);
+          }
         } catch (error) {
           console.error('Error parsing detection data:', error);
         }
@@ -28,7 +28,7 @@ echo "Starting $NUM_WORKERS worker(s)..."
 
 for i in $(seq 1 $NUM_WORKERS); do
     echo "Starting worker $i..."
-    rq worker -u redis://localhost:6379/0 --with-scheduler &
+    python -m workers.detector &
 done
 
 echo "✓ All services started!"
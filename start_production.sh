@@ -21,13 +21,15 @@ elif [[ -f ./ssl/cert.pem && -f ./ssl/key.pem ]]; then
     SSL_ARGS="--ssl-certfile ./ssl/cert.pem --ssl-keyfile ./ssl/key.pem"
 fi
 
-python -m uvicorn backend.main:app --host 0.0.0.0 --port $BACKEND_PORT $SSL_ARGS &
+python -m uvicorn backend.main:app --host 0.0.0.0 --port $BACKEND_PORT \
+    --loop uvloop --http httptools --log-level warning --no-access-log \
+    --ws-per-message-deflate false $SSL_ARGS &
 BACKEND_PID=$!
 
 # Start workers
 echo "Starting detection workers (2 instances)..."
 for i in {1..2}; do
-    rq worker -u redis://localhost:$REDIS_PORT/$REDIS_DB --with-scheduler &
+    python -m workers.detector &
 done
 
 echo "✓ All services started!"
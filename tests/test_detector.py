@@ -0,0 +1,112 @@
+"""
+Checks of the worker's CUDA inference path.
+
+With a GPU, run_inference runs end to end, and upload_batch (stage_frame,
+the pinned staging buffers, upload_stream) is checked against a host
+letterbox. Without one, only run_inference's CUDA branch is exercised, on
+CPU tensors: upload_batch is replaced by a host letterbox, so that covers
+letterbox_gpu, predict_batch and scale_boxes, and the upload test is skipped.
+"""
+
+import importlib
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("ultralytics")
+
+from torchvision.ops import box_iou
+from ultralytics.utils import ASSETS
+
+ROOT = Path(__file__).resolve().parent.parent
+
+requires_cuda = pytest.mark.skipif(
+    not torch.cuda.is_available(), reason="requires a CUDA device"
+)
+
+
+@pytest.fixture(scope="module")
+def detector():
+    """The worker module, loaded with the repo's yolov8n.pt."""
+    with pytest.MonkeyPatch.context() as mp:
+        # MODEL_PATH is read at import; don't leak it to other tests
+        mp.setenv("MODEL_PATH", str(ROOT / "yolov8n.pt"))
+        return importlib.import_module("workers.detector")
+
+
+@pytest.fixture
+def frames():
+    """Two BGR frames of different sizes, both with detectable objects."""
+    return [cv2.imread(str(ASSETS / name)) for name in ("bus.jpg", "zidane.jpg")]
+
+
+def letterbox_cpu(detector, frame):
+    """Letterbox a BGR frame into a host (3, IMG_SIZE, IMG_SIZE) tensor."""
+    out = torch.empty((3, detector.IMG_SIZE, detector.IMG_SIZE))
+    detector.letterbox_gpu(torch.from_numpy(frame).permute(2, 0, 1).flip(0), out)
+    return out
+
+
+@pytest.fixture
+def cuda_path(detector, monkeypatch):
+    """Route run_inference through its CUDA branch, emulated on CPU if needed."""
+    if not torch.cuda.is_available():
+        monkeypatch.setattr(detector, "USE_CUDA", True)
+        monkeypatch.setattr(
+            detector,
+            "upload_batch",
+            lambda frames: torch.stack([letterbox_cpu(detector, f) for f in frames]),
+        )
+        # Build the predictor whose backend predict_batch calls directly
+        detector.model(
+            torch.zeros((1, 3, detector.IMG_SIZE, detector.IMG_SIZE)),
+            **detector.PREDICT_ARGS,
+        )
+    return detector
+
+
+@requires_cuda
+def test_upload_batch_matches_host_letterbox(detector, frames):
+    # Twice: the second pass reuses the pinned buffers grown by the first
+    for _ in range(2):
+        batch = detector.upload_batch(frames)
+        torch.cuda.synchronize()
+
+        assert batch.is_cuda
+        for i, frame in enumerate(frames):
+            assert detector.host_staging[i].is_pinned()
+            assert detector.host_staging[i].numel() >= frame.size
+            assert torch.allclose(
+                batch[i].cpu(), letterbox_cpu(detector, frame), atol=1e-3
+            )
+
+
+def test_cuda_inference_matches_ultralytics(cuda_path, frames):
+    outputs = cuda_path.run_inference(frames)
+    expected = cuda_path.model(frames, **cuda_path.PREDICT_ARGS)
+
+    assert len(outputs) == len(frames)
+    for frame, (detections, inference_time), result in zip(frames, outputs, expected):
+        height, width = frame.shape[:2]
+        assert detections
+        assert inference_time >= 0
+        assert sorted(d["label"] for d in detections) == sorted(
+            result.names[int(c)] for c in result.boxes.cls
+        )
+        for d in detections:
+            assert 0 <= d["x"] and d["x"] + d["width"] <= width
+            assert 0 <= d["y"] and d["y"] + d["height"] <= height
+
+        # Boxes land where Ultralytics' own letterbox + rescale puts them; the
+        # GPU resize differs slightly from cv2's, so compare by overlap
+        boxes = torch.tensor(
+            [
+                [d["x"], d["y"], d["x"] + d["width"], d["y"] + d["height"]]
+                for d in detections
+            ],
+            dtype=torch.float32,
+        )
+        iou = box_iou(boxes, result.boxes.xyxy.float())
+        assert (iou.max(dim=1).values > 0.9).all()
@@ -33,6 +33,7 @@ PATIENCE = 20  # Early stopping
 IMG_SIZE = 640
 DEVICE = 0  # GPU index
 WORKERS = 8
+EXPORT_BATCH = 8  # Fixed inference batch; the worker batches to match
 
 
 def validate_dataset(dataset_yaml: str) -> bool:
@@ -157,6 +158,9 @@ def export_onnx(weights: str, output_dir: str = "models") -> str:
     """
     Export model to ONNX format.
 
+    Input shape is fixed (EXPORT_BATCH x 3 x IMG_SIZE x IMG_SIZE) so
+    ONNX Runtime / TensorRT can pick exact-shape kernels.
+
     Args:
         weights: Path to model weights
         output_dir: Directory to save ONNX model
@@ -167,7 +171,15 @@ def export_onnx(weights: str, output_dir: str = "models") -> str:
     logger.info(f"Exporting to ONNX: {weights}")
 
     model = YOLO(weights)
-    onnx_path = model.export(format="onnx", imgsz=IMG_SIZE, device=DEVICE, opset=12)
+    onnx_path = model.export(
+        format="onnx",
+        imgsz=IMG_SIZE,
+        device=DEVICE,
+        opset=17,
+        dynamic=False,
+        batch=EXPORT_BATCH,
+        simplify=True,
+    )
 
     logger.info(f"✓ ONNX export complete: {onnx_path}")
     return str(onnx_path)
@@ -177,6 +189,10 @@ def export_tensorrt(weights: str, output_dir: str = "models") -> str:
     """
     Export model to TensorRT format (requires CUDA).
 
+    The engine is written next to the weights (best.engine), where the
+    worker picks it up in preference to the .pt file. Its input shape is
+    fixed to EXPORT_BATCH frames; the worker pads smaller batches.
+
     Args:
         weights: Path to model weights
         output_dir: Directory to save TensorRT model
@@ -190,9 +206,11 @@ def export_tensorrt(weights: str, output_dir: str = "models") -> str:
         model = YOLO(weights)
         trt_path = model.export(
             format="engine",
-            imgsz=IMG_SIZE,
+            imgsz=IMG_SIZE,  # Worker runs at the same fixed size
             device=DEVICE,
             half=True,  # FP16 precision for faster inference
+            batch=EXPORT_BATCH,
+            dynamic=False,  # Static shape lets TensorRT specialize kernels
             workspace=4,  # 4GB workspace
         )
 
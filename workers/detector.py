@@ -1,24 +1,35 @@
 """
 Worker process for YOLOv8 object detection.
-Listens to Redis job queue, performs inference, and publishes results via Redis pubsub.
+Reads frame jobs from a Redis stream consumer group in micro-batches, runs
+batched inference, and publishes per-frame results via Redis pubsub.
+
+Run with: python -m workers.detector
 """
 
-import json
 import logging
 import os
+import signal
+import socket
+import time
 from io import BytesIO
-from typing import List, Dict, Any
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Union
 
 import cv2
+import msgpack
 import numpy as np
 import redis
 import torch
+import torch.nn.functional as F
+from torchvision.io import ImageReadMode, decode_jpeg
 from ultralytics import YOLO
+from ultralytics.utils import ops
 from dotenv import load_dotenv
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+except ImportError:
+    TurboJPEG = None
 
 # Load environment variables
 load_dotenv()
@@ -28,27 +39,178 @@ REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
 MODEL_PATH = os.getenv("MODEL_PATH", "models/best.pt")
 CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", 0.5))
+IMG_SIZE = int(os.getenv("IMG_SIZE", 640))  # Must match the exported engine
+GPU_JPEG_DECODE = os.getenv("GPU_JPEG_DECODE", "false").lower() == "true"
+TORCH_COMPILE = os.getenv("TORCH_COMPILE", "false").lower() in ("true", "1")
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO" if DEBUG else "WARNING").upper()
+FRAME_STREAM = os.getenv("FRAME_STREAM", "frames")
+CONSUMER_GROUP = os.getenv("CONSUMER_GROUP", "detectors")
+WORKER_NAME = f"{socket.gethostname()}:{os.getpid()}"
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 8))  # Engines impose their own
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", 10))
+WORKER_HEARTBEAT_TTL = 30  # Seconds before an idle worker drops off /status
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", 10))  # Old job_timeout=10, per batch
+STALE_PENDING_MS = JOB_TIMEOUT * 2 * 1000  # Pending longer than any live batch
+REDIS_RETRY_MAX_DELAY = 30.0  # Seconds, cap for the reconnect backoff
+
+# Configure logging
+logging.basicConfig(level=LOG_LEVEL)
+logger = logging.getLogger(__name__)
 
 # Object definitions dictionary mapping class names to their descriptions
 OBJECT_DEFINITIONS = {
     "sarga": "lorem ipsum dolor sit amet, consectetur adipiscing elit. Sed do eiusmod tempor incididunt ut labore et dolore magna aliqua."
 }
 
+# SIMD libjpeg-turbo decoder; falls back to OpenCV's imdecode when the
+# PyTurboJPEG package or the libturbojpeg shared library is missing
+jpeg_decoder = None
+if TurboJPEG is not None:
+    try:
+        jpeg_decoder = TurboJPEG()
+    except (OSError, RuntimeError) as e:
+        logger.warning(f"libturbojpeg unavailable, using OpenCV decoder: {e}")
+
 # Initialize Redis
 redis_client = redis.Redis(
     host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=False
 )
 
+
+def resolve_model_path(model_path: str) -> str:
+    """
+    Prefer a TensorRT engine exported next to the configured weights.
+
+    train.py's export writes best.engine beside best.pt; when it exists and
+    CUDA is available, Ultralytics runs it through TensorRT instead of
+    eager PyTorch.
+
+    Args:
+        model_path: Configured weights path (MODEL_PATH)
+
+    Returns:
+        Path of the model file to load
+    """
+    path = Path(model_path)
+    engine_path = path.with_suffix(".engine")
+
+    if path.suffix == ".pt" and engine_path.exists() and torch.cuda.is_available():
+        return str(engine_path)
+
+    return model_path
+
+
+USE_CUDA = torch.cuda.is_available()
+
+if USE_CUDA:
+    # Fixed input size lets cuDNN autotune once for the PyTorch fallback
+    torch.backends.cudnn.benchmark = True
+
+    # Decoded frames are staged in page-locked memory (one buffer per batch
+    # slot, grown on demand) and uploaded on a dedicated stream, where they
+    # are letterboxed straight into a persistent device batch
+    host_staging: List[Optional[torch.Tensor]] = [None] * MAX_BATCH_SIZE
+    device_batch = torch.empty((MAX_BATCH_SIZE, 3, IMG_SIZE, IMG_SIZE), device="cuda")
+    upload_stream = torch.cuda.Stream()
+else:
+    GPU_JPEG_DECODE = False
+
 # Initialize YOLOv8 model (loaded once per worker)
+MODEL_PATH = resolve_model_path(MODEL_PATH)
 logger.info(f"Loading YOLOv8 model from {MODEL_PATH}...")
 try:
-    model = YOLO(MODEL_PATH)
+    model = YOLO(MODEL_PATH, task="detect")
     logger.info(f"✓ Model loaded successfully")
 except Exception as e:
     logger.error(f"✗ Failed to load model: {e}")
     raise
 
+# torch.compile only applies to the eager .pt fallback. Off by default since
+# compiling adds a long cold start
+TORCH_COMPILE = TORCH_COMPILE and USE_CUDA and MODEL_PATH.endswith(".pt")
+
+# Exported engines have a fixed batch size and compiled CUDA graphs are
+# captured for one shape, so every call must be a full batch
+STATIC_BATCH = MODEL_PATH.endswith(".engine") or TORCH_COMPILE
+
+# Shared predict() arguments (half only takes effect when the predictor is built)
+PREDICT_ARGS = {
+    "imgsz": IMG_SIZE,
+    "conf": CONFIDENCE_THRESHOLD,
+    "half": TORCH_COMPILE,
+    "verbose": False,
+}
+
+# Class id -> name / definition, resolved once instead of per detected box
+CLASS_NAMES = tuple(model.names[i] for i in range(len(model.names)))
+CLASS_DEFINITIONS = tuple(
+    OBJECT_DEFINITIONS.get(name.lower(), "") for name in CLASS_NAMES
+)
+
+
+def compile_model():
+    """
+    Compile the PyTorch network with torch.compile (TORCH_COMPILE=true).
+
+    A first predict builds Ultralytics' backend, which fuses conv+bn and
+    casts to FP16; only then is the network switched to channels_last and
+    compiled, since compiling earlier would be undone by that fusion. A
+    second predict triggers compilation before the first real frame.
+    Falls back to the eager network if compilation fails.
+    """
+    global device_batch
+
+    # Feed NHWC batches so cuDNN can use its channels_last kernels
+    device_batch = device_batch.contiguous(memory_format=torch.channels_last)
+    model(device_batch.zero_(), **PREDICT_ARGS)
+
+    backend = model.predictor.model
+    eager = backend.model
+    try:
+        backend.model = torch.compile(
+            eager.to(memory_format=torch.channels_last), mode="reduce-overhead"
+        )
+        model(device_batch, **PREDICT_ARGS)
+        logger.info("✓ Model compiled with torch.compile")
+    except Exception as e:
+        backend.model = eager
+        logger.warning(f"torch.compile failed, using eager model: {e}")
+
+
+def warm_up():
+    """
+    Build the predictor whose backend predict_batch calls directly.
+
+    A TensorRT engine only accepts the batch size it was exported with. If
+    MAX_BATCH_SIZE differs, this first predict fails; the engine's batch
+    size is then read from its input binding and adopted instead.
+    """
+    global MAX_BATCH_SIZE, host_staging, device_batch
+
+    try:
+        model(device_batch.zero_(), **PREDICT_ARGS)
+        return
+    except AssertionError:
+        if model.predictor is None or not MODEL_PATH.endswith(".engine"):
+            raise
+
+    engine_batch = model.predictor.model.bindings["images"].shape[0]
+    logger.warning(
+        f"Engine was exported for batch {engine_batch}, "
+        f"overriding MAX_BATCH_SIZE={MAX_BATCH_SIZE}"
+    )
+    MAX_BATCH_SIZE = engine_batch
+    host_staging = [None] * MAX_BATCH_SIZE
+    device_batch = torch.empty((MAX_BATCH_SIZE, 3, IMG_SIZE, IMG_SIZE), device="cuda")
+    model(device_batch.zero_(), **PREDICT_ARGS)
+
+
+if TORCH_COMPILE:
+    compile_model()
+elif USE_CUDA:
+    warm_up()
+
 
 def decode_frame(frame_data: bytes) -> np.ndarray:
     """
@@ -60,6 +222,12 @@ def decode_frame(frame_data: bytes) -> np.ndarray:
     Returns:
         OpenCV image (BGR format)
     """
+    if jpeg_decoder is not None:
+        try:
+            return jpeg_decoder.decode(frame_data, pixel_format=TJPF_BGR)
+        except OSError as e:
+            raise ValueError(f"Failed to decode frame: {e}")
+
     nparr = np.frombuffer(frame_data, np.uint8)
     frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
@@ -69,128 +237,502 @@ def decode_frame(frame_data: bytes) -> np.ndarray:
     return frame
 
 
-def run_inference(frame: np.ndarray) -> tuple[List[Dict[str, Any]], float]:
+def decode_frame_gpu(frame_data: bytes) -> torch.Tensor:
     """
-    Run YOLOv8 inference on frame.
+    Decode JPEG frame data on the GPU with nvJPEG (GPU_JPEG_DECODE=true).
 
     Args:
+        frame_data: Binary JPEG data
+
+    Returns:
+        RGB uint8 tensor (3, H, W) on the GPU
+    """
+    data = torch.frombuffer(bytearray(frame_data), dtype=torch.uint8)
+    return decode_jpeg(data, mode=ImageReadMode.RGB, device="cuda")
+
+
+def frame_hw(frame: Union[np.ndarray, torch.Tensor]) -> tuple[int, int]:
+    """Height and width of a BGR HWC array or an RGB CHW tensor."""
+    if isinstance(frame, torch.Tensor):
+        return tuple(frame.shape[1:])
+    return frame.shape[:2]
+
+
+def stage_frame(slot: int, frame: np.ndarray) -> torch.Tensor:
+    """
+    Copy a decoded frame into pinned memory and start its upload.
+
+    Must run on upload_stream.
+
+    Args:
+        slot: Batch index, selects the pinned staging buffer
         frame: OpenCV image (BGR)
 
     Returns:
-        Tuple of (detections list, inference time in ms)
-    """
-    # Run inference
-    results = model(frame, conf=CONFIDENCE_THRESHOLD, verbose=False)
-    inference_time = results[0].speed["inference"]
-
-    # Extract detections
-    detections = []
-    result = results[0]
-
-    if result.boxes is not None:
-        boxes = result.boxes.cpu()
-
-        for box in boxes:
-            # Get bounding box coordinates (xyxy format)
-            x1, y1, x2, y2 = box.xyxy[0].numpy().astype(int)
-            x, y, w, h = x1, y1, (x2 - x1), (y2 - y1)
-
-            # Get class label and confidence
-            class_id = int(box.cls[0])
-            confidence = float(box.conf[0])
-            class_name = model.names[class_id]
-
-            # Get definition from dictionary (default to empty string if not found)
-            definition = OBJECT_DEFINITIONS.get(class_name.lower(), "")
-
-            detections.append(
-                {
-                    "x": int(x),
-                    "y": int(y),
-                    "width": int(w),
-                    "height": int(h),
-                    "label": class_name,
-                    "definition": definition,
-                    "confidence": round(confidence, 3),
-                    "class_id": int(class_id),
-                }
+        RGB uint8 tensor (3, H, W) on the GPU
+    """
+    if host_staging[slot] is None or host_staging[slot].numel() < frame.size:
+        host_staging[slot] = torch.empty(frame.size, dtype=torch.uint8, pin_memory=True)
+
+    host = host_staging[slot][: frame.size].view(frame.shape)
+    host.numpy()[:] = frame
+
+    # BGR HWC -> RGB CHW
+    return host.to("cuda", non_blocking=True).permute(2, 0, 1).flip(0)
+
+
+def letterbox_gpu(image: torch.Tensor, out: torch.Tensor) -> None:
+    """
+    Resize image into out (IMG_SIZE x IMG_SIZE) keeping its aspect ratio.
+
+    Scale and padding match Ultralytics' own letterbox, so ops.scale_boxes
+    maps detections back to the original frame.
+
+    Args:
+        image: RGB uint8 tensor (3, H, W) on the GPU
+        out: Float (3, IMG_SIZE, IMG_SIZE) slot of the device batch
+    """
+    h, w = image.shape[1:]
+    r = min(IMG_SIZE / h, IMG_SIZE / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    left = int(round((IMG_SIZE - new_w) / 2 - 0.1))
+    top = int(round((IMG_SIZE - new_h) / 2 - 0.1))
+
+    resized = F.interpolate(
+        image.unsqueeze(0).float().div_(255),
+        size=(new_h, new_w),
+        mode="bilinear",
+        align_corners=False,
+    )
+    out.fill_(114 / 255)
+    out[:, top : top + new_h, left : left + new_w] = resized[0]
+
+
+def upload_batch(frames: List[Union[np.ndarray, torch.Tensor]]) -> torch.Tensor:
+    """
+    Upload and letterbox a batch of frames on the GPU.
+
+    Args:
+        frames: OpenCV images (BGR) or nvJPEG-decoded GPU tensors, at most
+            MAX_BATCH_SIZE
+
+    Returns:
+        RGB float tensor (N, 3, IMG_SIZE, IMG_SIZE) in [0, 1] on the GPU;
+        N is MAX_BATCH_SIZE when STATIC_BATCH, trailing slots unused
+    """
+    # GPU-decoded frames were produced on the default stream
+    upload_stream.wait_stream(torch.cuda.current_stream())
+
+    with torch.cuda.stream(upload_stream):
+        for i, frame in enumerate(frames):
+            image = frame if isinstance(frame, torch.Tensor) else stage_frame(i, frame)
+            letterbox_gpu(image, device_batch[i])
+
+    torch.cuda.current_stream().wait_stream(upload_stream)
+
+    if STATIC_BATCH:
+        # Results for the unused slots are dropped by the caller's zip()
+        return device_batch
+    return device_batch[: len(frames)]
+
+
+@torch.inference_mode()
+def predict_batch(
+    batch: torch.Tensor, frame_shapes: List[tuple[int, int]]
+) -> tuple[List[torch.Tensor], float]:
+    """
+    Run the network and NMS on a letterboxed device batch.
+
+    Bypasses model(): given a tensor, Ultralytics checks its range with a
+    blocking im.max() and copies the whole batch back to the host for
+    Results.orig_img, neither of which the worker needs.
+
+    Boxes are rescaled here rather than by the caller: NMS outputs are
+    inference tensors, which can only be updated in place in inference mode.
+
+    Args:
+        batch: Output of upload_batch
+        frame_shapes: (height, width) of each original frame
+
+    Returns:
+        (N, 6) detections per frame in frame coordinates, and the batch
+        inference time in ms
+    """
+    predictor = model.predictor
+    with ops.Profile() as dt:
+        preds = predictor.model(batch)
+
+    detections = ops.non_max_suppression(
+        preds,
+        CONFIDENCE_THRESHOLD,
+        predictor.args.iou,
+        agnostic=predictor.args.agnostic_nms,
+        max_det=predictor.args.max_det,
+        classes=predictor.args.classes,
+    )
+
+    # Map boxes from letterboxed coordinates back to each frame
+    for data, frame_shape in zip(detections, frame_shapes):
+        if len(data):
+            data[:, :4] = ops.scale_boxes(
+                (IMG_SIZE, IMG_SIZE), data[:, :4], frame_shape
             )
 
-    return detections, inference_time
+    return detections, dt.t * 1e3
 
 
-def detect_objects(
-    frame_id: str, frame_key: str, client_id: str, result_channel: str
-) -> Dict[str, Any]:
+def run_inference(
+    frames: List[Union[np.ndarray, torch.Tensor]],
+) -> List[tuple[List[Dict[str, Any]], float]]:
     """
-    Main detection job function. Called by RQ worker.
+    Run YOLOv8 inference on a batch of frames in a single model call.
 
     Args:
-        frame_id: Unique frame identifier
-        frame_key: Redis key where frame is stored
-        client_id: Client identifier for result routing
-        result_channel: Redis pubsub channel to publish results
+        frames: OpenCV images (BGR), or RGB GPU tensors with GPU_JPEG_DECODE
 
     Returns:
-        Job result metadata
+        List of (detections list, inference time in ms), one per frame
     """
+    if USE_CUDA:
+        # Preprocess and predict on the GPU without leaving the device
+        batch_detections, batch_time = predict_batch(
+            upload_batch(frames), [frame_hw(frame) for frame in frames]
+        )
+        frame_times = [batch_time / len(frames)] * len(frames)
+    else:
+        results = model(frames, **PREDICT_ARGS)
+        batch_detections = [result.boxes.data for result in results]
+        frame_times = [result.speed["inference"] for result in results]
+
+    outputs = []
+    for data, inference_time in zip(batch_detections, frame_times):
+        # Extract detections
+        detections = []
+
+        # (N, 6) rows of x1, y1, x2, y2, conf, cls
+        if len(data):
+            # Single device-to-host copy, then work on whole columns
+            data = data.cpu().numpy()
+            xyxy = data[:, :4].astype(np.int32)
+            widths = xyxy[:, 2] - xyxy[:, 0]
+            heights = xyxy[:, 3] - xyxy[:, 1]
+            class_ids = data[:, 5].astype(np.int32)
+
+            for x, y, w, h, class_id, confidence in zip(
+                xyxy[:, 0].tolist(),
+                xyxy[:, 1].tolist(),
+                widths.tolist(),
+                heights.tolist(),
+                class_ids.tolist(),
+                data[:, 4].tolist(),
+            ):
+                detections.append(
+                    {
+                        "x": x,
+                        "y": y,
+                        "width": w,
+                        "height": h,
+                        "label": CLASS_NAMES[class_id],
+                        "definition": CLASS_DEFINITIONS[class_id],
+                        "confidence": round(confidence, 3),
+                        "class_id": class_id,
+                    }
+                )
+
+        outputs.append((detections, inference_time))
+
+    return outputs
+
+
+def ensure_consumer_group():
+    """Create the frame stream and its consumer group if they don't exist."""
     try:
-        logger.info(f"Processing frame {frame_id}")
-
-        # Retrieve frame from Redis
-        frame_data = redis_client.get(frame_key)
-        if frame_data is None:
-            logger.error(f"Frame {frame_id} not found in Redis")
-            return {"status": "error", "message": "Frame not found"}
-
-        # Decode frame
-        frame = decode_frame(frame_data)
-        logger.debug(f"Frame {frame_id} decoded: {frame.shape}")
-
-        # Run inference
-        detections, inference_time = run_inference(frame)
-        logger.info(
-            f"Frame {frame_id} inference complete: {len(detections)} objects detected in {inference_time:.1f}ms"
+        # "$": only frames added from now on, stale backlog is useless live
+        redis_client.xgroup_create(FRAME_STREAM, CONSUMER_GROUP, id="$", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def drop_stale_entries():
+    """
+    Ack and delete frames left pending by workers that died mid-batch.
+
+    Those frames are abandoned rather than re-run: their clients have long
+    since timed them out. Consumers with nothing pending (earlier runs of
+    crashed workers) are removed from the group too; a live one removed
+    this way is recreated by its next read.
+    """
+    dropped = 0
+    while True:
+        entry_ids = redis_client.xautoclaim(
+            FRAME_STREAM,
+            CONSUMER_GROUP,
+            WORKER_NAME,
+            min_idle_time=STALE_PENDING_MS,
+            count=100,
+            justid=True,
         )
+        if not entry_ids:
+            break
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.xack(FRAME_STREAM, CONSUMER_GROUP, *entry_ids)
+        pipe.xdel(FRAME_STREAM, *entry_ids)
+        pipe.execute()
+        dropped += len(entry_ids)
+
+    for consumer in redis_client.xinfo_consumers(FRAME_STREAM, CONSUMER_GROUP):
+        name = consumer["name"].decode()
+        if name != WORKER_NAME and consumer["pending"] == 0:
+            redis_client.xgroup_delconsumer(FRAME_STREAM, CONSUMER_GROUP, name)
+
+    if dropped:
+        logger.info(f"Dropped {dropped} stale pending frame(s)")
+
+
+def release_consumer():
+    """Drop this worker's pending frames and leave the consumer group."""
+    pending = redis_client.xpending_range(
+        FRAME_STREAM,
+        CONSUMER_GROUP,
+        min="-",
+        max="+",
+        count=MAX_BATCH_SIZE * 4,
+        consumername=WORKER_NAME,
+    )
+    entry_ids = [entry["message_id"] for entry in pending]
+    if entry_ids:
+        redis_client.xack(FRAME_STREAM, CONSUMER_GROUP, *entry_ids)
+        redis_client.xdel(FRAME_STREAM, *entry_ids)
+    redis_client.xgroup_delconsumer(FRAME_STREAM, CONSUMER_GROUP, WORKER_NAME)
+
+
+def read_frames(count: int, block_ms: int) -> List[Dict[str, Any]]:
+    """
+    Read up to count new frame jobs for this worker from the consumer group.
 
-        # Prepare result JSON
-        result = {
-            "frame_id": frame_id,
-            "client_id": client_id,
-            "detections": detections,
-            "inference_time_ms": round(inference_time, 1),
-            "num_detections": len(detections),
-            "status": "success",
+    Args:
+        count: Maximum number of entries to read
+        block_ms: Milliseconds to block when no entry is available
+
+    Returns:
+        List of job dicts (empty if nothing arrived in time)
+    """
+    response = redis_client.xreadgroup(
+        CONSUMER_GROUP,
+        WORKER_NAME,
+        {FRAME_STREAM: ">"},
+        count=count,
+        block=block_ms,
+    )
+    if not response:
+        return []
+
+    _, entries = response[0]
+    return [
+        {
+            "entry_id": entry_id,
+            "frame_id": fields[b"frame_id"].decode(),
+            "frame_bytes": fields[b"data"],
+            "client_id": fields[b"client_id"].decode(),
+            "result_channel": fields[b"result_channel"].decode(),
         }
+        for entry_id, fields in entries
+    ]
+
+
+def collect_batch(timeout: float = 1.0) -> List[Dict[str, Any]]:
+    """
+    Read up to MAX_BATCH_SIZE frame jobs from the stream.
+
+    Blocks for the first job, then keeps taking jobs for at most
+    BATCH_WINDOW_MS so bursts are merged into one inference call.
+
+    Args:
+        timeout: Seconds to block waiting for the first job
+
+    Returns:
+        List of job dicts (empty if the stream stayed idle)
+    """
+    jobs = read_frames(MAX_BATCH_SIZE, int(timeout * 1000))
+    if not jobs:
+        return []
+
+    deadline = time.monotonic() + BATCH_WINDOW_MS / 1000
+
+    while len(jobs) < MAX_BATCH_SIZE:
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:
+            break
+
+        more = read_frames(MAX_BATCH_SIZE - len(jobs), remaining_ms)
+        if not more:
+            break
+        jobs.extend(more)
+
+    return jobs
 
-        # Publish result to client-specific channel
-        redis_client.publish(result_channel, json.dumps(result))
-        logger.debug(f"Published results for {frame_id} to {result_channel}")
 
-        # Cleanup: delete frame from Redis
-        redis_client.delete(frame_key)
+class JobTimeoutError(Exception):
+    """Raised when a batch runs longer than JOB_TIMEOUT."""
 
-        # Clear GPU cache to prevent memory leaks
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
 
-        return {"status": "success", "detections": len(detections)}
+def _raise_job_timeout(signum, frame):
+    """SIGALRM handler: abort the batch in progress."""
+    raise JobTimeoutError(f"Batch exceeded {JOB_TIMEOUT}s timeout")
+
+
+def detect_batch(jobs: List[Dict[str, Any]]) -> int:
+    """
+    Decode, run inference on and publish results for a batch of frame jobs.
+
+    Each job carries entry_id, frame_id, frame_bytes, client_id and
+    result_channel.
+    Frames that fail to decode get an error result; the rest of the batch
+    is still processed. A batch that runs past JOB_TIMEOUT is aborted and
+    every frame not answered yet gets an error result.
+
+    Args:
+        jobs: Frame jobs popped by collect_batch
+
+    Returns:
+        Number of frames successfully processed
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    frames, decoded_jobs = [], []
+    answered = set()  # Entry ids whose result is already in the pipeline
+    log_frames = logger.isEnabledFor(logging.DEBUG)
+    signal.alarm(JOB_TIMEOUT)
+
+    try:
+        for job in jobs:
+            try:
+                if GPU_JPEG_DECODE:
+                    frame = decode_frame_gpu(job["frame_bytes"])
+                else:
+                    frame = decode_frame(job["frame_bytes"])
+                if log_frames:
+                    logger.debug(f"Frame {job['frame_id']} decoded: {frame.shape}")
+                frames.append(frame)
+                decoded_jobs.append(job)
+            except JobTimeoutError:
+                raise
+            except Exception as e:
+                logger.error(f"Error decoding frame {job['frame_id']}: {e}")
+                pipe.publish(
+                    job["result_channel"], msgpack.packb(_error_result(job, e))
+                )
+                answered.add(job["entry_id"])
+
+        if frames:
+            outputs = run_inference(frames)
+            if log_frames:
+                logger.debug(f"Batch of {len(frames)} frame(s) inference complete")
+
+            for job, (detections, inference_time) in zip(decoded_jobs, outputs):
+                if log_frames:
+                    logger.debug(
+                        f"Frame {job['frame_id']}: {len(detections)} objects detected in {inference_time:.1f}ms"
+                    )
+
+                # Prepare result (msgpack: relayed as-is to the client)
+                result = {
+                    "frame_id": job["frame_id"],
+                    "client_id": job["client_id"],
+                    "detections": detections,
+                    "inference_time_ms": round(inference_time, 1),
+                    "num_detections": len(detections),
+                    "status": "success",
+                }
+
+                # Publish result to client-specific channel
+                pipe.publish(job["result_channel"], msgpack.packb(result))
+                answered.add(job["entry_id"])
+
+        return len(frames)
 
     except Exception as e:
-        logger.error(f"Error processing frame {frame_id}: {e}", exc_info=True)
-
-        # Send error result to client
-        error_result = {
-            "frame_id": frame_id,
-            "client_id": client_id,
-            "status": "error",
-            "message": str(e),
-        }
-        redis_client.publish(result_channel, json.dumps(error_result))
+        logger.error(f"Error processing batch: {e}", exc_info=True)
+
+        # Send an error for every frame still unanswered, so each frame gets
+        # exactly one result (on a timeout that includes undecoded frames)
+        for job in jobs:
+            if job["entry_id"] in answered:
+                continue
+            pipe.publish(job["result_channel"], msgpack.packb(_error_result(job, e)))
+
+        return 0
+
+    finally:
+        signal.alarm(0)
+
+        # Acknowledge and drop the consumed entries so the stream length is
+        # the backlog; all of it goes out with the results in one round trip
+        entry_ids = [job["entry_id"] for job in jobs]
+        pipe.xack(FRAME_STREAM, CONSUMER_GROUP, *entry_ids)
+        pipe.xdel(FRAME_STREAM, *entry_ids)
+        pipe.execute()
+
+
+def _error_result(job: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+    """Build the error payload sent to a client for a failed frame."""
+    return {
+        "frame_id": job["frame_id"],
+        "client_id": job["client_id"],
+        "status": "error",
+        "message": str(error),
+    }
+
+
+def run_worker():
+    """Consume frame jobs forever, one micro-batch at a time."""
+    worker_key = f"detector:worker:{WORKER_NAME}"
+    ensure_consumer_group()
+    drop_stale_entries()
+    logger.info(
+        f"Worker {WORKER_NAME} reading {FRAME_STREAM} as {CONSUMER_GROUP} "
+        f"(batch<={MAX_BATCH_SIZE}, window={BATCH_WINDOW_MS}ms)"
+    )
+
+    signal.signal(signal.SIGALRM, _raise_job_timeout)
+    next_heartbeat = 0.0
+    retry_delay = 1.0
 
-        return {"status": "error", "message": str(e)}
+    try:
+        while True:
+            try:
+                # Heartbeat so the backend can count live workers
+                if time.monotonic() >= next_heartbeat:
+                    redis_client.setex(worker_key, WORKER_HEARTBEAT_TTL, "1")
+                    next_heartbeat = time.monotonic() + WORKER_HEARTBEAT_TTL / 3
+
+                jobs = collect_batch()
+                if jobs:
+                    detect_batch(jobs)
+                retry_delay = 1.0
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                # Keep the worker alive through Redis restarts and blips
+                logger.warning(
+                    f"Redis unavailable ({e}), retrying in {retry_delay:.0f}s"
+                )
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, REDIS_RETRY_MAX_DELAY)
+                next_heartbeat = 0.0
+            except redis.ResponseError as e:
+                # Redis restarted without persistence: the group is gone
+                if "NOGROUP" not in str(e):
+                    raise
+                logger.warning("Consumer group missing, recreating it")
+                ensure_consumer_group()
+    except KeyboardInterrupt:
+        logger.info("Worker stopped")
+    finally:
+        try:
+            redis_client.delete(worker_key)
+            release_consumer()
+        except redis.RedisError:
+            pass
 
 
 if __name__ == "__main__":
-    # For manual testing
-    logger.info("Worker detector module loaded successfully")
+    run_worker()